@@ -1,7 +1,9 @@
 import os
+from operator import attrgetter
 
 import mlflow
 import mlflow.sklearn
+import numpy as np
 import pandas as pd
 from fastapi import APIRouter
 
@@ -19,6 +21,26 @@ alias = "production"
 
 model_uri = f"models:/{model_name}/{model_version}"
 
+# The model is a pipeline whose ColumnTransformer selects columns by name, so it
+# needs a DataFrame with the training column names
+MODEL_COLUMNS = pd.Index(
+    [
+        "Avg. Area Income",
+        "Avg. Area House Age",
+        "Avg. Area Number of Rooms",
+        "Avg. Area Number of Bedrooms",
+        "Area Population",
+    ]
+)
+# Request fields in the same order as MODEL_COLUMNS
+get_model_features = attrgetter(
+    "average_area_income",
+    "average_area_house_age",
+    "average_area_number_of_rooms",
+    "average_area_number_of_bedrooms",
+    "area_population",
+)
+
 # Lazy load model - only load when needed
 _model = None
 housing_router = APIRouter(prefix="/housing")
@@ -36,13 +58,13 @@ def get_model():
 @housing_router.post("/predict", response_model=HousingPredictionResponse)
 def func_predict(request: HousingPredictionRequest) -> HousingPredictionResponse:
     model = get_model()
-    input_data = {
-        "Avg. Area Income": [request.average_area_income],
-        "Avg. Area House Age": [request.average_area_house_age],
-        "Avg. Area Number of Rooms": [request.average_area_number_of_rooms],
-        "Avg. Area Number of Bedrooms": [request.average_area_number_of_bedrooms],
-        "Area Population": [request.area_population],
-    }
-    df = pd.DataFrame(input_data)
-    predictions = model.predict(df)
+    # Building the DataFrame from a 2D float array gives a single block with no
+    # per-column type inference, unlike a dict of one-item lists. The array is
+    # allocated per call because this handler runs in the threadpool, and stays
+    # float64 because the pipeline scales in float64.
+    input_data = pd.DataFrame(
+        np.array([get_model_features(request)], dtype=np.float64),
+        columns=MODEL_COLUMNS,
+    )
+    predictions = model.predict(input_data)
     return HousingPredictionResponse(predicted_price=predictions[0])
@@ -1,3 +1,4 @@
+import os
 import time
 
 import requests
@@ -6,116 +7,54 @@ GRAFANA_URL = "http://localhost:3000"
 AUTH = ("admin", "admin")  # Default credentials
 HEADERS = {"Content-Type": "application/json"}
 
+# Reuse one connection pool (and the auth/headers) for every Grafana API call
+SESSION = requests.Session()
+SESSION.auth = AUTH
+SESSION.headers.update(HEADERS)
 
-def wait_for_grafana():
+# Datasource and dashboard payloads live as JSON files in grafana/. They are read
+# once as raw bytes and posted as-is, so nothing is rebuilt or re-serialized per call.
+PAYLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grafana")
+
+
+def read_payload(file_name):
+    with open(os.path.join(PAYLOAD_DIR, file_name), "rb") as payload_file:
+        return payload_file.read()
+
+
+PROMETHEUS_PAYLOAD = read_payload("datasource_prometheus.json")
+LOKI_PAYLOAD = read_payload("datasource_loki.json")
+DASHBOARD_PAYLOAD = read_payload("dashboard.json")
+
+
+def wait_for_grafana(retries=30, interval_seconds=2):
     print("Waiting for Grafana to be ready...")
-    for _ in range(30):
+    for _ in range(retries):
         try:
-            requests.get(GRAFANA_URL)
-            return True
-        except Exception as e:
+            # /api/health only returns 200 once Grafana and its database are up
+            resp = SESSION.get(f"{GRAFANA_URL}/api/health", timeout=1.0)
+            if resp.status_code == 200:
+                return True
+            print(f"Grafana not ready yet: {resp.status_code}")
+        except requests.RequestException as e:
             print(f"Error waiting for Grafana: {e}")
-            time.sleep(2)
+        time.sleep(interval_seconds)
     return False
 
 
 def setup_datasource():
     print("Configuring Prometheus Datasource...")
-    prometheus_payload = {
-        "name": "Prometheus",
-        "type": "prometheus",
-        "url": "http://prometheus:9090",
-        "access": "proxy",
-        "isDefault": True,
-    }
-    resp = requests.post(
-        f"{GRAFANA_URL}/api/datasources",
-        auth=AUTH,
-        json=prometheus_payload,
-        headers=HEADERS,
-    )
+    resp = SESSION.post(f"{GRAFANA_URL}/api/datasources", data=PROMETHEUS_PAYLOAD)
     print(f"Prometheus Datasource: {resp.status_code}")
 
     print("Configuring Loki Datasource...")
-    loki_payload = {
-        "name": "Loki",
-        "type": "loki",
-        "url": "http://loki:3100",
-        "access": "proxy",
-        "isDefault": False,
-    }
-    resp = requests.post(
-        f"{GRAFANA_URL}/api/datasources", auth=AUTH, json=loki_payload, headers=HEADERS
-    )
+    resp = SESSION.post(f"{GRAFANA_URL}/api/datasources", data=LOKI_PAYLOAD)
     print(f"Loki Datasource: {resp.status_code}")
 
 
 def setup_dashboard():
     print("Creating Monitoring Dashboard...")
-    dashboard_payload = {
-        "dashboard": {
-            "id": None,
-            "title": "ML Service Health",
-            "tags": ["mlops"],
-            "timezone": "browser",
-            "panels": [
-                {
-                    "title": "Requests per Second (RPS)",
-                    "type": "timeseries",
-                    "gridPos": {"h": 8, "w": 12, "x": 0, "y": 0},
-                    "datasource": {"type": "prometheus", "uid": "prometheus"},
-                    "targets": [
-                        {
-                            "expr": "rate(http_requests_total[1m])",
-                            "legendFormat": "{{handler}}",
-                        }
-                    ],
-                },
-                {
-                    "title": "99th Percentile Latency",
-                    "type": "timeseries",
-                    "gridPos": {"h": 8, "w": 12, "x": 12, "y": 0},
-                    "datasource": {"type": "prometheus", "uid": "prometheus"},
-                    "targets": [
-                        {
-                            "expr": "histogram_quantile(0.99, sum(rate(http_request_duration_seconds_bucket[1m])) by (le))"
-                        }
-                    ],
-                },
-                {
-                    "title": "Total Predictions",
-                    "type": "stat",
-                    "gridPos": {"h": 4, "w": 6, "x": 0, "y": 8},
-                    "datasource": {"type": "prometheus", "uid": "prometheus"},
-                    "targets": [
-                        {"expr": "sum(http_requests_total{handler='/predict'})"}
-                    ],
-                },
-                {
-                    "title": "ML Service Logs",
-                    "type": "logs",
-                    "gridPos": {"h": 12, "w": 24, "x": 0, "y": 12},
-                    "datasource": {"type": "loki", "uid": "loki"},
-                    "targets": [{"expr": '{container="ml_service"}', "refId": "A"}],
-                    "options": {
-                        "showTime": True,
-                        "showLabels": True,
-                        "showCommonLabels": False,
-                        "wrapLogMessage": True,
-                        "sortOrder": "Descending",
-                    },
-                },
-            ],
-            "refresh": "5s",
-        },
-        "overwrite": True,
-    }
-    resp = requests.post(
-        f"{GRAFANA_URL}/api/dashboards/db",
-        auth=AUTH,
-        json=dashboard_payload,
-        headers=HEADERS,
-    )
+    resp = SESSION.post(f"{GRAFANA_URL}/api/dashboards/db", data=DASHBOARD_PAYLOAD)
     print(f"Dashboard Status: {resp.status_code} - {resp.text}")
 
 
@@ -1,13 +1,24 @@
+import asyncio
+import glob
 import logging
 import os
+import re
+import threading
+import time
 from datetime import datetime
 
+import numpy as np
+import onnxruntime as ort
 import pandas as pd
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from evidently import Report
+from evidently.core.report import Snapshot
 from evidently.presets import DataDriftPreset
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
 from sklearn.datasets import load_iris
 from sklearn.ensemble import RandomForestClassifier
 
@@ -22,25 +33,258 @@ logger = logging.getLogger(__name__)
 data = load_iris(as_frame=True)
 df_reference = data.frame
 
+# Feature order expected by the model. /predict builds its input array in this order.
+FEATURES = (
+    "sepal length (cm)",
+    "sepal width (cm)",
+    "petal length (cm)",
+    "petal width (cm)",
+)
+
+# Production features are logged as float32 (see production_data below); keep the
+# reference features in the same dtype so drift reports compare like with like and
+# move half the bytes of float64.
+df_reference = df_reference.astype({name: np.float32 for name in FEATURES})
+
 # Simple model
+# Fit on a plain ndarray so predict() can take one without feature-name checks.
 model = RandomForestClassifier()
-model.fit(df_reference.drop("target", axis=1), df_reference["target"])
+model.fit(df_reference[list(FEATURES)].to_numpy(), df_reference["target"])
+
+# Reference data for drift reports: only the float32 features, in FEATURES order,
+# matching the columns of get_production_dataframe(). Built once, not on every run.
+df_reference_features = df_reference[list(FEATURES)].reset_index(drop=True)
+
+# Serve predictions through ONNX Runtime: it walks the forest in C++ instead of
+# sklearn's per-tree Python loop. Inputs must be float32 with shape (n, n_features).
+onnx_model = convert_sklearn(
+    model,
+    initial_types=[("X", FloatTensorType([None, len(FEATURES)]))],
+    options={id(model): {"zipmap": False}},
+)
+onnx_session = ort.InferenceSession(
+    onnx_model.SerializeToString(), providers=["CPUExecutionProvider"]
+)
+
+
+def onnx_predict(X):
+    """Predict class ids for a float32 array of shape (n, n_features)."""
+    return onnx_session.run(["label"], {"X": X})[0]
+
 
 # Mapping for readability
 target_names = data.target_names
 
 # Global store for production data (for demo purposes only - use a DB in production!)
-# We keep a rolling window of the last 500 requests
-production_data = []
+# We keep a rolling window of the last 500 requests, stored column-wise in
+# preallocated ring buffers: one array per feature plus one for the predictions.
+PRODUCTION_WINDOW_SIZE = 500
+production_data = {
+    name: np.empty(PRODUCTION_WINDOW_SIZE, dtype=np.float32) for name in FEATURES
+}
+production_data["prediction"] = np.empty(PRODUCTION_WINDOW_SIZE, dtype=np.int64)
+production_write_index = 0  # Next slot to overwrite
+production_count = 0  # Number of valid rows, capped at PRODUCTION_WINDOW_SIZE
+# Writes happen on the event loop, reads from report jobs in other threads
+production_lock = threading.Lock()
+
+
+def log_production_data(input_row, prediction_idx):
+    """Write one request into the ring buffers, overwriting the oldest row when full."""
+    global production_write_index, production_count
+    with production_lock:
+        for i, name in enumerate(FEATURES):
+            production_data[name][production_write_index] = input_row[i]
+        production_data["prediction"][production_write_index] = prediction_idx
+        production_write_index = (production_write_index + 1) % PRODUCTION_WINDOW_SIZE
+        production_count = min(production_count + 1, PRODUCTION_WINDOW_SIZE)
+
+
+def get_production_dataframe(columns=FEATURES):
+    """
+    Snapshot the requested columns of the logged window as a DataFrame (rows in
+    buffer order, not by time). The columns must share a dtype, like the float32
+    features. The valid rows are copied once, under the lock, into a single 2D array
+    that the DataFrame wraps without copying: one block, no per-row conversion and
+    no dtype inference, and stable while /predict keeps writing.
+    """
+    with production_lock:
+        values = np.column_stack(
+            [production_data[name][:production_count] for name in columns]
+        )
+    return pd.DataFrame(values, columns=list(columns), copy=False)
 
-app = FastAPI()
+
+# orjson serializes responses faster than the stdlib json encoder
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # --- 2. Instrumentation (Prometheus) ---
 # This automatically creates the /metrics endpoint for Prometheus to scrape
 instrumentator = Instrumentator().instrument(app).expose(app)
 
 
+# --- 2.2. Micro-batched Inference ---
+# Concurrent /predict requests are queued and scored together with one onnx_predict
+# call, so the fixed per-call overhead is paid once per batch instead of once per
+# request. A batch is flushed when it is full or when the oldest request has
+# waited MAX_BATCH_LATENCY_SECONDS.
+MAX_BATCH_SIZE = 32
+MAX_BATCH_LATENCY_SECONDS = 0.005
+
+# Created on startup so they belong to the server's event loop
+prediction_queue = None
+batch_worker_task = None
+
+
+async def predict_batch_worker():
+    """
+    Collects queued (row, future) pairs into batches, predicts each batch in the
+    default executor and resolves every request's future with its own result.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        # Block until at least one request arrives
+        row, future = await prediction_queue.get()
+        rows, futures = [row], [future]
+
+        # Keep collecting until the batch is full or the latency budget runs out
+        deadline = loop.time() + MAX_BATCH_LATENCY_SECONDS
+        while len(rows) < MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                row, future = await asyncio.wait_for(prediction_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            rows.append(row)
+            futures.append(future)
+
+        try:
+            predictions = await loop.run_in_executor(None, onnx_predict, np.stack(rows))
+        except Exception as e:
+            logger.error(f"Batch prediction error: {str(e)}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+
+        logger.debug(f"Predicted a batch of {len(rows)} requests")
+        for future, prediction in zip(futures, predictions):
+            # The request may have been cancelled while waiting (client disconnect)
+            if not future.done():
+                future.set_result(prediction)
+
+
+async def predict_batched(row):
+    """Queue a single feature row for the batch worker and wait for its prediction."""
+    future = asyncio.get_running_loop().create_future()
+    await prediction_queue.put((row, future))
+    return await future
+
+
+# --- 2.4. Report Listing Cache ---
+# /monitor/status lists the most recent reports. The report directory only changes
+# when a report is generated, so the listing is cached for a short TTL and dropped
+# explicitly whenever a new report is saved.
+REPORTS_CACHE_TTL_SECONDS = 30
+recent_reports_cache = None  # (monotonic timestamp, report list) or None
+# Bumped on every invalidation, so a scan that overlapped a new report is not cached.
+# The lock covers the generation check and store, not the directory scan.
+recent_reports_generation = 0
+recent_reports_lock = threading.Lock()
+
+
+def list_recent_reports(reports_dir="reports", limit=10):
+    """Scan the reports directory, newest first, with a single stat() per file."""
+    report_files = []
+
+    if os.path.exists(reports_dir):
+        # Get all drift reports (HTML and JSON snapshots) sorted by modification time
+        # (newest first)
+        report_pattern = os.path.join(reports_dir, "drift_report_*")
+        files = [
+            (file, os.stat(file))
+            for file in glob.glob(report_pattern)
+            if file.endswith((".html", ".json"))
+        ]
+        files.sort(key=lambda item: item[1].st_mtime, reverse=True)
+
+        for file, stat in files[:limit]:
+            file_name = os.path.basename(file)
+            mod_time = datetime.fromtimestamp(stat.st_mtime).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            if file_name.endswith(".json"):
+                # Snapshots are rendered to HTML on demand by the ML service
+                timestamp = file_name[len("drift_report_") : -len(".json")]
+                url = f"http://localhost:8000/monitor/report/{timestamp}"
+            else:
+                url = f"http://localhost:8080/{file_name}"
+            report_files.append(
+                {
+                    "name": file_name,
+                    "url": url,
+                    "size_bytes": stat.st_size,
+                    "modified": mod_time,
+                }
+            )
+
+    return report_files
+
+
+def get_recent_reports():
+    """Return the cached report listing, rescanning once it is older than the TTL."""
+    global recent_reports_cache
+    # Read the globals once; another thread may invalidate them while we run
+    generation = recent_reports_generation
+    cache = recent_reports_cache
+    now = time.monotonic()
+    if cache is None or now - cache[0] > REPORTS_CACHE_TTL_SECONDS:
+        cache = (now, list_recent_reports())
+        # If a report was saved during the scan, the listing may already be stale:
+        # return it for this call but leave the cache empty for the next one
+        with recent_reports_lock:
+            if generation == recent_reports_generation:
+                recent_reports_cache = cache
+    return cache[1]
+
+
+def invalidate_recent_reports():
+    """Drop the cached report listing so the next status call rescans."""
+    global recent_reports_cache, recent_reports_generation
+    with recent_reports_lock:
+        recent_reports_generation += 1
+        recent_reports_cache = None
+
+
 # --- 2.5. Automatic Drift Detection ---
+# Scheduled runs save a compact JSON snapshot instead of the full interactive HTML
+# (~280 KB vs ~4 MB of embedded JS/CSS); GET /monitor/report/{timestamp} renders a
+# snapshot to HTML when someone wants to look at it. drift_report_latest.html is
+# still written for the report viewer unless DRIFT_REPORT_LATEST_HTML=false.
+SAVE_LATEST_HTML_REPORT = (
+    os.getenv("DRIFT_REPORT_LATEST_HTML", "true").lower() == "true"
+)
+LATEST_HTML_REPORT_NAME = "drift_report_latest.html"
+# Built once and shared by the automatic and manual paths. Report.run() returns a new
+# Snapshot each time and leaves the report itself unchanged, so it is safe to reuse.
+drift_report = Report([DataDriftPreset()])
+
+
+def get_latest_report_url(report_files):
+    """
+    URL of the newest report in a listing from get_recent_reports().
+    drift_report_latest.html is only used while scheduled runs keep it up to date.
+    """
+    for report in report_files:
+        if report["name"] == LATEST_HTML_REPORT_NAME and not SAVE_LATEST_HTML_REPORT:
+            # Left over from a manual run; newer snapshots may exist
+            continue
+        return report["url"]
+    return None
+
+
 # TODO: In a real app, we would use a database to store the production data.
 # TODO: We would also use a more sophisticated drift detection algorithm.
 # TODO: We would also use a more sophisticated drift detection algorithm.
@@ -48,36 +292,28 @@ def generate_drift_report_background():
     """
     Background task to automatically generate drift reports.
     Runs periodically without requiring manual API calls.
+    Returns the timestamp of the saved snapshot, or None if no report was saved.
     """
     logger.info(
-        f"[AUTOMATIC] Drift report generation triggered. Production data points: {len(production_data)}"
+        f"[AUTOMATIC] Drift report generation triggered. Production data points: {production_count}"
     )
 
-    if len(production_data) < 10:
+    if production_count < 10:
         logger.warning(
             "[AUTOMATIC] Not enough data to generate report. Skipping this cycle."
         )
         return
 
     try:
-        # Create DataFrame from current logs
-        df_current = pd.DataFrame(production_data)
+        # Create DataFrame from a snapshot of the current logs (features only, which
+        # is exactly what drift detection needs)
+        df_current = get_production_dataframe(FEATURES)
         logger.debug(f"[AUTOMATIC] Current data shape: {df_current.shape}")
 
-        # Feature list for drift detection
-        features_list = [
-            "sepal length (cm)",
-            "sepal width (cm)",
-            "petal length (cm)",
-            "petal width (cm)",
-        ]
-
         # Generate Report
         logger.info("[AUTOMATIC] Generating Evidently drift report...")
-        report = Report([DataDriftPreset()])
-
-        my_eval = report.run(
-            reference_data=df_reference, current_data=df_current[features_list]
+        my_eval = drift_report.run(
+            reference_data=df_reference_features, current_data=df_current
         )
 
         # Save report with timestamp
@@ -85,37 +321,53 @@ def generate_drift_report_background():
         os.makedirs(reports_dir, exist_ok=True)
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_path = os.path.join(reports_dir, f"drift_report_{timestamp}.html")
+        report_path = os.path.join(reports_dir, f"drift_report_{timestamp}.json")
 
-        # Also save as latest for easy access
-        latest_report_path = os.path.join(reports_dir, "drift_report_latest.html")
+        logger.info(f"[AUTOMATIC] Saving report snapshot to {report_path}")
+        with open(report_path, "w", encoding="utf-8") as report_file:
+            report_file.write(my_eval.dumps())
 
-        logger.info(f"[AUTOMATIC] Saving report to {report_path}")
-        my_eval.save_html(report_path)
-        my_eval.save_html(latest_report_path)
+        # Also save as latest HTML for easy access
+        if SAVE_LATEST_HTML_REPORT:
+            latest_report_path = os.path.join(reports_dir, LATEST_HTML_REPORT_NAME)
+            my_eval.save_html(latest_report_path)
+        invalidate_recent_reports()
 
         # Verify the file was created
         if os.path.exists(report_path):
             file_size = os.path.getsize(report_path)
             logger.info(
-                f"[AUTOMATIC] Report successfully saved. Size: {file_size} bytes. Data points analyzed: {len(production_data)}"
+                f"[AUTOMATIC] Report successfully saved. Size: {file_size} bytes. Data points analyzed: {production_count}"
             )
         else:
             logger.error(f"[AUTOMATIC] Report file was not created at {report_path}")
+            return None
+
+        return timestamp
 
     except Exception as e:
         logger.error(f"[AUTOMATIC] Error generating drift report: {str(e)}")
 
 
+async def drift_detection_job():
+    """
+    Scheduled entry point. Runs on the event loop and hands the CPU-heavy Evidently
+    work to a worker thread so requests keep being served meanwhile.
+    """
+    await asyncio.to_thread(generate_drift_report_background)
+
+
 # Initialize and start the background scheduler
 # TODO: In a real app, we would use Airflow or Celery to schedule the background tasks.
-scheduler = BackgroundScheduler()
+# AsyncIOScheduler runs on uvicorn's event loop (started in startup_event) instead
+# of spinning up its own scheduler thread and thread pool.
+scheduler = AsyncIOScheduler()
 # Run drift detection every 5 minutes (300 seconds)
 # Adjust the interval based on your needs:
 # - For testing: interval=60 (1 minute)
 # - For production: interval=3600 (1 hour) or more
 scheduler.add_job(
-    generate_drift_report_background,
+    drift_detection_job,
     "interval",
     seconds=300,  # 5 minutes
     id="drift_detection",
@@ -130,19 +382,31 @@ logger.info(
 
 @app.on_event("startup")
 async def startup_event():
-    """Start the scheduler when the app starts"""
+    """Start the scheduler and the prediction batch worker when the app starts"""
+    global prediction_queue, batch_worker_task
     scheduler.start()
     logger.info("Background scheduler started successfully")
 
+    prediction_queue = asyncio.Queue()
+    batch_worker_task = asyncio.create_task(predict_batch_worker())
+    logger.info("Prediction batch worker started successfully")
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Shutdown the scheduler gracefully"""
+    """Shutdown the scheduler and the prediction batch worker gracefully"""
     scheduler.shutdown()
     logger.info("Background scheduler shut down successfully")
 
+    if batch_worker_task is not None:
+        batch_worker_task.cancel()
+        logger.info("Prediction batch worker stopped")
+
 
 # --- 3. API Endpoints ---
+# Endpoints that do blocking work (Evidently reports, file system scans) are plain
+# `def`, so FastAPI runs them in its threadpool instead of on the event loop.
+# /predict stays `async` because it only awaits the batch worker.
 
 
 @app.post("/predict")
@@ -152,26 +416,21 @@ async def predict(features: dict):
     Expected keys: sepal length (cm), sepal width (cm), petal length (cm), petal width (cm)
     """
     try:
-        # Convert input to DataFrame
-        input_df = pd.DataFrame([features])
+        # Build a (n_features,) row; much cheaper than a one-row DataFrame.
+        # Allocated per call so concurrent requests never share a buffer.
+        input_row = np.array([features[name] for name in FEATURES], dtype=np.float32)
 
-        # Predict
-        prediction_idx = model.predict(input_df)[0]
+        # Predict (batched together with other in-flight requests)
+        prediction_idx = await predict_batched(input_row)
         prediction_class = target_names[prediction_idx]
 
-        # Log for monitoring (Append to our memory list)
-        # We add the prediction to the input features to track concept drift if we had labels
-        log_entry = features.copy()
-        log_entry["prediction"] = int(prediction_idx)
+        # Log for monitoring (Write into our in-memory ring buffers)
+        # We store the prediction with the input features to track concept drift if we had labels
         # TODO: In a real app, we would use a database to store the production data.
-        production_data.append(log_entry)
-
-        # Keep only last 500 items to manage memory
-        if len(production_data) > 500:
-            production_data.pop(0)
+        log_production_data(input_row, prediction_idx)
 
         logger.debug(
-            f"Prediction made. Total production data points: {len(production_data)}"
+            f"Prediction made. Total production data points: {production_count}"
         )
         return {"class": prediction_class, "class_id": int(prediction_idx)}
     except Exception as e:
@@ -181,42 +440,33 @@ async def predict(features: dict):
 
 # TODO: In a real production app, we would not need this endpoint. Instead, we would use Airflow or Celery to generate the reports.
 @app.get("/monitor/generate_report")
-async def generate_report():
+def generate_report():
     """
     Manually triggers drift report generation (OPTIONAL - reports are generated automatically every 5 minutes).
     Use this endpoint if you want an immediate on-demand report.
     """
     logger.info(
-        f"[MANUAL] Report generation requested. Production data points: {len(production_data)}"
+        f"[MANUAL] Report generation requested. Production data points: {production_count}"
     )
 
-    if len(production_data) < 10:
+    if production_count < 10:
         logger.warning("[MANUAL] Not enough data to generate report")
         return {
             "message": "Not enough data to generate report. Run the simulator first.",
-            "current_data_points": len(production_data),
+            "current_data_points": production_count,
             "note": "Automatic reports are generated every 5 minutes once enough data is collected.",
         }
 
     try:
-        # Create DataFrame from current logs
-        df_current = pd.DataFrame(production_data)
+        # Create DataFrame from a snapshot of the current logs (features only, which
+        # is exactly what drift detection needs)
+        df_current = get_production_dataframe(FEATURES)
         logger.info(f"[MANUAL] Current data shape: {df_current.shape}")
 
-        # Feature list for drift detection
-        features_list = [
-            "sepal length (cm)",
-            "sepal width (cm)",
-            "petal length (cm)",
-            "petal width (cm)",
-        ]
-
         # Generate Report
         logger.info("[MANUAL] Generating Evidently report...")
-        report = Report([DataDriftPreset()])
-
-        my_eval = report.run(
-            reference_data=df_reference, current_data=df_current[features_list]
+        my_eval = drift_report.run(
+            reference_data=df_reference_features, current_data=df_current
         )
 
         # Save report with timestamp
@@ -232,6 +482,7 @@ async def generate_report():
         logger.info(f"[MANUAL] Saving report to {report_path}")
         my_eval.save_html(report_path)
         my_eval.save_html(latest_report_path)
+        invalidate_recent_reports()
 
         # Verify the file was created
         if os.path.exists(report_path):
@@ -244,7 +495,7 @@ async def generate_report():
             "message": "Report generated successfully (manual trigger)",
             "latest_report_url": "http://localhost:8080/drift_report_latest.html",
             "timestamped_report": f"http://localhost:8080/drift_report_manual_{timestamp}.html",
-            "data_points_analyzed": len(production_data),
+            "data_points_analyzed": production_count,
             "report_path": report_path,
             "note": "Automatic reports are generated every 5 minutes and saved with timestamps.",
         }
@@ -255,35 +506,12 @@ async def generate_report():
 
 # TODO: In a real production app, we would not need this endpoint. Instead, we would use Airflow or Celery to generate the reports.
 @app.get("/monitor/status")
-async def monitor_status():
+def monitor_status():
     """
     Get the status of automatic drift monitoring.
     """
-    import glob
-
-    reports_dir = "reports"
-    report_files = []
-
-    if os.path.exists(reports_dir):
-        # Get all drift reports sorted by modification time (newest first)
-        report_pattern = os.path.join(reports_dir, "drift_report_*.html")
-        files = glob.glob(report_pattern)
-        files.sort(key=os.path.getmtime, reverse=True)
-
-        for file in files[:10]:  # Show last 10 reports
-            file_name = os.path.basename(file)
-            file_size = os.path.getsize(file)
-            mod_time = datetime.fromtimestamp(os.path.getmtime(file)).strftime(
-                "%Y-%m-%d %H:%M:%S"
-            )
-            report_files.append(
-                {
-                    "name": file_name,
-                    "url": f"http://localhost:8080/{file_name}",
-                    "size_bytes": file_size,
-                    "modified": mod_time,
-                }
-            )
+    # Cached for REPORTS_CACHE_TTL_SECONDS; new reports invalidate it immediately
+    report_files = get_recent_reports()
 
     # Get scheduler job info
     job = scheduler.get_job("drift_detection")
@@ -300,29 +528,51 @@ async def monitor_status():
         "interval_seconds": 300,
         "interval_description": "5 minutes",
         "next_scheduled_run": next_run,
-        "current_data_points": len(production_data),
+        "current_data_points": production_count,
         "minimum_data_points_required": 10,
-        "ready_for_detection": len(production_data) >= 10,
+        "ready_for_detection": production_count >= 10,
         "recent_reports": report_files,
-        "latest_report_url": (
-            "http://localhost:8080/drift_report_latest.html" if report_files else None
-        ),
+        "latest_report_url": get_latest_report_url(report_files),
     }
 
 
+@app.get("/monitor/report/{timestamp}", response_class=HTMLResponse)
+def view_report(timestamp: str):
+    """
+    Render an automatically generated drift report snapshot as HTML.
+    `timestamp` is the YYYYMMDD_HHMMSS part of drift_report_<timestamp>.json.
+    """
+    # Only accept the timestamp format we write, so the path cannot leave reports/
+    if not re.fullmatch(r"\d{8}_\d{6}", timestamp):
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    report_path = os.path.join("reports", f"drift_report_{timestamp}.json")
+    if not os.path.exists(report_path):
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    logger.info(f"[VIEW] Rendering report snapshot {report_path}")
+    return HTMLResponse(Snapshot.load(report_path).get_html_str(as_iframe=False))
+
+
 # TODO: In a real production app, we would not need this endpoint. Instead, we would use Airflow or Celery to generate the reports.
 @app.post("/monitor/trigger_now")
-async def trigger_drift_detection_now():
+def trigger_drift_detection_now():
     """
     Immediately trigger the automatic drift detection (bypasses the schedule).
     Useful for testing or when you need an immediate report.
     """
     logger.info("[TRIGGER] Immediate drift detection requested")
-    generate_drift_report_background()
+    timestamp = generate_drift_report_background()
+    if timestamp is None:
+        latest_report_url = None
+    elif SAVE_LATEST_HTML_REPORT:
+        latest_report_url = f"http://localhost:8080/{LATEST_HTML_REPORT_NAME}"
+    else:
+        latest_report_url = f"http://localhost:8000/monitor/report/{timestamp}"
     return {
         "message": "Drift detection triggered successfully",
-        "data_points_analyzed": len(production_data),
-        "latest_report_url": "http://localhost:8080/drift_report_latest.html",
+        "data_points_analyzed": production_count,
+        "latest_report_url": latest_report_url,
     }
 
 
@@ -1,51 +1,73 @@
+import asyncio
 import random
-import time
 
+import httpx
 import numpy as np
-import requests
 
 API_URL = "http://localhost:8000/predict"
+# Maximum number of requests in flight at the same time
+MAX_CONCURRENT_REQUESTS = 10
 
+FEATURES = (
+    "sepal length (cm)",
+    "sepal width (cm)",
+    "petal length (cm)",
+    "petal width (cm)",
+)
+# Per-feature mean/std, similar to the Iris dataset
+FEATURE_MEANS = np.array([5.8, 3.0, 3.7, 1.2])
+FEATURE_STDS = np.array([0.8, 0.4, 1.7, 0.7])
+# Per-feature shift applied to drifted data
+DRIFT_OFFSETS = np.array([2.5, -1.0, 3.0, 0.0])
 
-def generate_normal_data():
-    """Generates data similar to Iris dataset mean/std"""
-    return {
-        "sepal length (cm)": abs(np.random.normal(5.8, 0.8)),
-        "sepal width (cm)": abs(np.random.normal(3.0, 0.4)),
-        "petal length (cm)": abs(np.random.normal(3.7, 1.7)),
-        "petal width (cm)": abs(np.random.normal(1.2, 0.7)),
-    }
+
+def generate_normal_data(steps):
+    """Generates `steps` rows similar to Iris dataset mean/std in a single RNG call"""
+    return np.abs(
+        np.random.normal(FEATURE_MEANS, FEATURE_STDS, size=(steps, len(FEATURES)))
+    )
 
 
-def generate_drifted_data():
+def generate_drifted_data(steps):
     """
-    Generates data with significantly higher values to cause drift.
+    Generates `steps` rows with significantly higher values to cause drift.
     Simulates a sensor malfunction or environment change.
     """
-    return {
-        "sepal length (cm)": abs(np.random.normal(5.8, 0.8)) + 2.5,  # Drift!
-        "sepal width (cm)": abs(np.random.normal(3.0, 0.4)) - 1.0,  # Drift!
-        "petal length (cm)": abs(np.random.normal(3.7, 1.7)) + 3.0,  # Drift!
-        "petal width (cm)": abs(np.random.normal(1.2, 0.7)),
-    }
+    return generate_normal_data(steps) + DRIFT_OFFSETS  # Drift!
 
 
-def run_simulation(mode="normal", steps=50):
-    print(f"--- Starting Simulation: {mode.upper()} Traffic ---")
-    for i in range(steps):
-        if mode == "drift":
-            data = generate_drifted_data()
-        else:
-            data = generate_normal_data()
-
+async def send_request(client, semaphore, data, label):
+    async with semaphore:
+        # Random sleep to simulate real traffic patterns for Grafana
+        await asyncio.sleep(random.uniform(0.1, 0.5))
         try:
-            resp = requests.post(API_URL, json=data)
-            print(f"[{i+1}/{steps}] {mode} request sent. Status: {resp.status_code}")
+            resp = await client.post(API_URL, json=data)
+            print(f"{label} request sent. Status: {resp.status_code}")
         except Exception as e:
             print(f"Error: {e}")
 
-        # Random sleep to simulate real traffic patterns for Grafana
-        time.sleep(random.uniform(0.1, 0.5))
+
+async def run_simulation(mode="normal", steps=50):
+    print(f"--- Starting Simulation: {mode.upper()} Traffic ---")
+    if mode == "drift":
+        samples = generate_drifted_data(steps)
+    else:
+        samples = generate_normal_data(steps)
+
+    # Send up to MAX_CONCURRENT_REQUESTS requests at once over one connection pool
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    async with httpx.AsyncClient() as client:
+        await asyncio.gather(
+            *(
+                send_request(
+                    client,
+                    semaphore,
+                    dict(zip(FEATURES, samples[i].tolist())),
+                    f"[{i+1}/{steps}] {mode}",
+                )
+                for i in range(steps)
+            )
+        )
 
 
 if __name__ == "__main__":
@@ -54,10 +76,10 @@ if __name__ == "__main__":
     print("=" * 80)
 
     print("\n1. Sending Normal Traffic...")
-    run_simulation("normal", 50)
+    asyncio.run(run_simulation("normal", 50))
 
     print("\n2. Sending Drifted Traffic (Simulating Issue)...")
-    run_simulation("drift", 50)
+    asyncio.run(run_simulation("drift", 50))
 
     print("\n" + "=" * 80)
     print("Simulation Complete!")
@@ -1,5 +1,6 @@
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pytest
 
 
@@ -13,19 +14,14 @@ def mock_model():
     return mock_model
 
 
-@pytest.fixture
-def mock_pandas():
-    mock_pandas = MagicMock()
-    mock_pandas.DataFrame.return_value = {"test": [1, 2, 3]}
-    with patch("scripts.session_3.router.predict.pd", mock_pandas):  # type hint
-        yield mock_pandas
-
-
 @pytest.fixture
 def mock_mlflow_server(mock_model):
     mock_mlflow_server = MagicMock()
     mock_mlflow_server.sklearn.load_model.return_value = mock_model
-    with patch("scripts.session_3.router.predict.mlflow", mock_mlflow_server):
+    with (
+        patch("scripts.session_3.router.predict.mlflow", mock_mlflow_server),
+        patch("scripts.session_3.router.predict._model", None),
+    ):
         yield mock_mlflow_server
 
 
@@ -38,7 +34,7 @@ def test_get_model(mock_mlflow_server, mock_model):
     assert result == [2.0]
 
 
-def test_predict(mock_mlflow_server, mock_model, mock_pandas):
+def test_predict(mock_mlflow_server, mock_model):
     from fastapi import FastAPI
     from fastapi.testclient import TestClient
 
@@ -59,12 +55,13 @@ def test_predict(mock_mlflow_server, mock_model, mock_pandas):
     )
     assert response.status_code == 200
     assert response.json() == {"predicted_price": 2.0}
-    mock_pandas.DataFrame.assert_called_once_with(
-        {
-            "Avg. Area Income": [100000],
-            "Avg. Area House Age": [10],
-            "Avg. Area Number of Rooms": [3],
-            "Avg. Area Number of Bedrooms": [2],
-            "Area Population": [100000],
-        }
-    )
+    mock_model.predict.assert_called_once()
+    (input_data,) = mock_model.predict.call_args.args
+    assert list(input_data.columns) == [
+        "Avg. Area Income",
+        "Avg. Area House Age",
+        "Avg. Area Number of Rooms",
+        "Avg. Area Number of Bedrooms",
+        "Area Population",
+    ]
+    np.testing.assert_array_equal(input_data, [[100000, 10, 3, 2, 100000]])